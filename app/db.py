@@ -1,6 +1,8 @@
 from flask import *
 from werkzeug.security import generate_password_hash, check_password_hash
 from entities import *
+from rollups import registrar_cita_agendada, obtener_resumen_dashboard
+from sqlalchemy.exc import SQLAlchemyError
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from datetime import datetime
 import smtplib
@@ -82,6 +84,7 @@ def pagina_principal():
     Si el método de la solicitud es POST, se procesa el formulario de inicio de sesión.
     Si el método es GET, se verifica el token de sesión y se muestra la página principal.
     Si el token es válido, se muestra la página principal con el nombre de usuario y tipo de usuario.
+    Para los empleados se muestra además el resumen del día (citas por doctor, espacios libres por sucursal y ventas).
     Si el token es inválido o ha expirado, se redirige al usuario a la página de inicio de sesión con un mensaje de error.
     Returns:
         Respomse: redirect(url_for('login'))
@@ -101,10 +104,16 @@ def pagina_principal():
         # Puedes guardar información en session si deseas mantener sesión activa
         session['nombre_usuario'] = usuario
 
+        # El tablero solo se muestra a los empleados y se lee de las tablas de resumen precalculadas
+        resumen = None
+        if session.get('tipo_usuario') == 'Empleado':
+            resumen = obtener_resumen_dashboard()
+
         return render_template(
             'pagina_principal.html',
             nombre_usuario=session.get('nombre_usuario'),
-            tipo_usuario=session.get('tipo_usuario')
+            tipo_usuario=session.get('tipo_usuario'),
+            resumen=resumen
         )
 
     except SignatureExpired:
@@ -303,18 +312,24 @@ def citas():
                 flash('No se encontró el paciente.', 'error')
                 return redirect(url_for('citas'))
 
-            # Registrar la cita
-            consulta.disponible = False
-            db.session.commit()
-
-            nueva_cita = Cita(
-                id_paciente=paciente.id_paciente,
-                id_cita=consulta.id_cita_disponibles,
-                fecha_movimiento=datetime.now(),
-                finalizada=False
-            )
-            db.session.add(nueva_cita)
-            db.session.commit()
+            # Registrar la cita: el espacio, la cita y los resúmenes del tablero se guardan en una sola transacción
+            try:
+                consulta.disponible = False
+
+                nueva_cita = Cita(
+                    id_paciente=paciente.id_paciente,
+                    id_cita_disponible=consulta.id_cita_disponibles,
+                    fecha_movimiento=datetime.now(),
+                    finalizada=False
+                )
+                db.session.add(nueva_cita)
+
+                registrar_cita_agendada(consulta)
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                flash('No se pudo reservar la cita. Intente de nuevo.', 'error')
+                return redirect(url_for('citas'))
 
             flash('Cita reservada exitosamente', 'success')
             return redirect(url_for('pagina_principal', usuario=session['nombre_usuario'], token=session['token']))
@@ -0,0 +1,25 @@
+-- Tablas de resumen diario para el tablero de la página principal (ver rollups.py).
+-- Ejecutar una vez sobre la base de datos farmacia_alejo:
+--     mysql -u root -p farmacia_alejo < resumenes_diarios.sql
+-- Después, llenar las tablas con el historial necesario, por ejemplo los últimos 30 días y los próximos 30:
+--     flask --app db reconciliar-resumenes --dias 30 --dias-futuros 30
+-- Mientras no se corra la reconciliación el tablero se muestra vacío.
+
+CREATE TABLE IF NOT EXISTS Resumen_Diario_Sucursal (
+    fecha DATE NOT NULL,
+    id_sucursal INT NOT NULL,
+    citas_agendadas INT NOT NULL DEFAULT 0,
+    espacios_disponibles INT NOT NULL DEFAULT 0,
+    numero_ventas INT NOT NULL DEFAULT 0,
+    total_ventas DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_sucursal),
+    FOREIGN KEY (id_sucursal) REFERENCES Sucursal(id_sucursal)
+);
+
+CREATE TABLE IF NOT EXISTS Resumen_Diario_Doctor (
+    fecha DATE NOT NULL,
+    id_doctor INT NOT NULL,
+    citas_agendadas INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_doctor),
+    FOREIGN KEY (id_doctor) REFERENCES Doctor(id_doctor)
+);
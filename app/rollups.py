@@ -0,0 +1,258 @@
+"""
+Este archivo contiene el mantenimiento de las tablas de resumen diario que alimentan el tablero de la página principal.
+Las citas agendadas por sucursal y por doctor se actualizan de forma incremental al reservar una cita,
+de modo que la página principal solo lee unas cuantas filas precalculadas.
+Las ventas y los espacios publicados en CitasDisponibles no tienen una ruta de escritura en la aplicación,
+por lo que solo se reflejan en el tablero al correr la reconciliación.
+El comando `flask --app db reconciliar-resumenes` recalcula los resúmenes desde las tablas origen y
+debe programarse de forma periódica (por ejemplo con cron) para corregir cualquier desviación.
+Las tablas se crean con resumenes_diarios.sql; después de crearlas hay que correr una vez
+`flask --app db reconciliar-resumenes --dias N --dias-futuros N` para llenarlas, de lo contrario el tablero aparece vacío.
+"""
+
+from datetime import date, timedelta
+import click
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
+from entities import *
+
+
+def _agregados_sucursal(fecha, id_sucursal=None):
+
+    """
+    Calcula desde las tablas origen los totales de un día agrupados por sucursal.
+    Las ventas se asignan a la sucursal del empleado que las registró; las ventas sin fecha_venta
+    o de empleados sin sucursal no se contabilizan.
+    Args:
+        fecha (date): Día a calcular.
+        id_sucursal (int): Si se indica, solo se calcula esa sucursal.
+    Returns:
+        dict: {id_sucursal: {columna: valor}}
+    """
+
+    citas = (
+        db.session.query(CitasDisponibles.id_sucursal, func.count(Cita.id_cita))
+        .join(Cita, Cita.id_cita_disponible == CitasDisponibles.id_cita_disponibles)
+        .filter(CitasDisponibles.fecha_disponible == fecha)
+    )
+    espacios = (
+        db.session.query(CitasDisponibles.id_sucursal, func.count(CitasDisponibles.id_cita_disponibles))
+        .filter(CitasDisponibles.fecha_disponible == fecha, CitasDisponibles.disponible == True)
+    )
+    ventas = (
+        db.session.query(Empleado.id_sucursal, func.count(Venta.id_venta), func.coalesce(func.sum(Venta.total_venta), 0))
+        .join(Venta, Venta.id_empleado == Empleado.id_empleado)
+        .filter(Venta.fecha_venta == fecha, Empleado.id_sucursal.isnot(None))
+    )
+
+    if id_sucursal is not None:
+        citas = citas.filter(CitasDisponibles.id_sucursal == id_sucursal)
+        espacios = espacios.filter(CitasDisponibles.id_sucursal == id_sucursal)
+        ventas = ventas.filter(Empleado.id_sucursal == id_sucursal)
+
+    agregados = {}
+
+    def fila(id_fila):
+        return agregados.setdefault(id_fila, {'citas_agendadas': 0, 'espacios_disponibles': 0, 'numero_ventas': 0, 'total_ventas': 0})
+
+    for id_fila, total in citas.group_by(CitasDisponibles.id_sucursal):
+        fila(id_fila)['citas_agendadas'] = total
+    for id_fila, total in espacios.group_by(CitasDisponibles.id_sucursal):
+        fila(id_fila)['espacios_disponibles'] = total
+    for id_fila, numero, total in ventas.group_by(Empleado.id_sucursal):
+        fila(id_fila)['numero_ventas'] = numero
+        fila(id_fila)['total_ventas'] = total
+
+    return agregados
+
+
+def _agregados_doctor(fecha, id_doctor=None):
+
+    """
+    Calcula desde las tablas origen las citas agendadas de un día agrupadas por doctor.
+    Args:
+        fecha (date): Día a calcular.
+        id_doctor (int): Si se indica, solo se calcula ese doctor.
+    Returns:
+        dict: {id_doctor: {columna: valor}}
+    """
+
+    citas = (
+        db.session.query(CitasDisponibles.id_doctor, func.count(Cita.id_cita))
+        .join(Cita, Cita.id_cita_disponible == CitasDisponibles.id_cita_disponibles)
+        .filter(CitasDisponibles.fecha_disponible == fecha)
+    )
+
+    if id_doctor is not None:
+        citas = citas.filter(CitasDisponibles.id_doctor == id_doctor)
+
+    return {id_fila: {'citas_agendadas': total} for id_fila, total in citas.group_by(CitasDisponibles.id_doctor)}
+
+
+def _aplicar_cambios(modelo, claves, cambios, agregar_desde_origen):
+
+    """
+    Suma los cambios a la fila de resumen indicada con un solo upsert en la base de datos
+    (INSERT ... ON DUPLICATE KEY UPDATE en MySQL, ON CONFLICT DO UPDATE en SQLite).
+    Si la fila todavía no existe se inserta con los valores calculados desde las tablas origen, que ya incluyen
+    el evento actual; si otra transacción la crea al mismo tiempo, el upsert suma los cambios sobre esa fila.
+    Args:
+        modelo (db.Model): ResumenDiarioSucursal o ResumenDiarioDoctor.
+        claves (dict): Llave primaria de la fila (fecha y sucursal o doctor).
+        cambios (dict): {columna: incremento}
+        agregar_desde_origen (function): Función que devuelve los valores de la fila calculados desde las tablas origen.
+    """
+
+    # Lectura sin bloqueo: si la fila ya existe no hace falta calcular los valores iniciales
+    existe = db.session.query(modelo.query.filter_by(**claves).exists()).scalar()
+
+    if existe:
+        # Solo se usan si un DELETE de la reconciliación quitó la fila y no la volvió a crear
+        valores = dict(cambios)
+    else:
+        # Se envían los cambios pendientes para que el cálculo desde origen incluya el evento actual
+        db.session.flush()
+        valores = agregar_desde_origen()
+
+    tabla = modelo.__table__
+    dialecto = db.session.get_bind().dialect.name
+    incrementos = {columna: tabla.c[columna] + incremento for columna, incremento in cambios.items()}
+
+    if dialecto == 'mysql':
+        sentencia = mysql_insert(tabla).values(**claves, **valores).on_duplicate_key_update(**incrementos)
+    elif dialecto == 'sqlite':
+        sentencia = sqlite_insert(tabla).values(**claves, **valores).on_conflict_do_update(
+            index_elements=list(claves), set_=incrementos
+        )
+    else:
+        raise NotImplementedError(f'Upsert de resúmenes no soportado para {dialecto}')
+
+    db.session.execute(sentencia)
+
+
+def registrar_cita_agendada(consulta):
+
+    """
+    Actualiza los resúmenes cuando un paciente reserva un espacio de CitasDisponibles.
+    Debe llamarse antes del commit que guarda la Cita para que ambos cambios queden en la misma transacción.
+    Args:
+        consulta (CitasDisponibles): El espacio que se acaba de reservar.
+    """
+
+    fecha = consulta.fecha_disponible
+
+    _aplicar_cambios(
+        ResumenDiarioSucursal,
+        {'fecha': fecha, 'id_sucursal': consulta.id_sucursal},
+        {'citas_agendadas': 1, 'espacios_disponibles': -1},
+        lambda: _agregados_sucursal(fecha, consulta.id_sucursal).get(consulta.id_sucursal, {})
+    )
+    _aplicar_cambios(
+        ResumenDiarioDoctor,
+        {'fecha': fecha, 'id_doctor': consulta.id_doctor},
+        {'citas_agendadas': 1},
+        lambda: _agregados_doctor(fecha, consulta.id_doctor).get(consulta.id_doctor, {})
+    )
+
+
+def reconciliar_resumenes(fecha):
+
+    """
+    Recalcula desde las tablas origen todos los resúmenes de un día y reemplaza las filas existentes.
+    Las filas del día se borran antes de calcular, dentro de la misma transacción.
+    Args:
+        fecha (date): Día a reconciliar.
+    """
+
+    # Si el día ya tiene filas, el DELETE las bloquea: una reserva en curso termina antes de que se calcule
+    # y una reserva nueva espera al commit y suma sobre la fila reconciliada.
+    # Si el día todavía no tiene filas (por ejemplo en el primer llenado), el DELETE solo bloquea huecos y
+    # una reserva que esté creando la misma fila puede terminar en deadlock con los INSERT de abajo;
+    # por eso el comando deshace y reintenta cada día por separado.
+    ResumenDiarioSucursal.query.filter_by(fecha=fecha).delete(synchronize_session=False)
+    ResumenDiarioDoctor.query.filter_by(fecha=fecha).delete(synchronize_session=False)
+
+    sucursales = _agregados_sucursal(fecha)
+    doctores = _agregados_doctor(fecha)
+
+    for id_sucursal, valores in sucursales.items():
+        db.session.add(ResumenDiarioSucursal(fecha=fecha, id_sucursal=id_sucursal, **valores))
+    for id_doctor, valores in doctores.items():
+        db.session.add(ResumenDiarioDoctor(fecha=fecha, id_doctor=id_doctor, **valores))
+
+    db.session.commit()
+
+
+def obtener_resumen_dashboard(fecha=None):
+
+    """
+    Lee los resúmenes precalculados de un día para mostrarlos en la página principal.
+    Args:
+        fecha (date): Día a consultar, por defecto hoy.
+    Returns:
+        dict: Filas por sucursal, filas por doctor y los totales del día.
+    """
+
+    fecha = fecha or date.today()
+
+    sucursales = (
+        ResumenDiarioSucursal.query
+        .options(joinedload(ResumenDiarioSucursal.sucursal))
+        .filter_by(fecha=fecha)
+        .all()
+    )
+    doctores = (
+        ResumenDiarioDoctor.query
+        .options(joinedload(ResumenDiarioDoctor.doctor).joinedload(Doctor.empleado))
+        .filter_by(fecha=fecha)
+        .all()
+    )
+
+    return {
+        'fecha': fecha,
+        'sucursales': sucursales,
+        'doctores': doctores,
+        'citas_agendadas': sum(fila.citas_agendadas for fila in sucursales),
+        'espacios_disponibles': sum(fila.espacios_disponibles for fila in sucursales),
+        'numero_ventas': sum(fila.numero_ventas for fila in sucursales),
+        'total_ventas': sum(fila.total_ventas for fila in sucursales),
+    }
+
+
+INTENTOS_RECONCILIACION = 3
+
+
+@app.cli.command('reconciliar-resumenes')
+@click.option('--dias', default=1, show_default=True, type=click.IntRange(min=1), help='Número de días a reconciliar, contando hacia atrás desde hoy (incluye hoy).')
+@click.option('--dias-futuros', default=7, show_default=True, type=click.IntRange(min=0), help='Número de días a reconciliar después de hoy.')
+def reconciliar_resumenes_comando(dias, dias_futuros):
+
+    """
+    Reconcilia los resúmenes diarios contra las tablas origen, desde hace `dias` días hasta dentro de `dias_futuros` días.
+    Las citas se agrupan por fecha_disponible, que suele ser futura, por eso también se reconcilian los próximos días.
+    Un error en un día (por ejemplo un deadlock con una reserva) se deshace y se reintenta; si persiste,
+    se reporta y se continúa con los demás días.
+    """
+
+    hoy = date.today()
+    fallidos = []
+
+    for desplazamiento in range(-(dias - 1), dias_futuros + 1):
+        fecha = hoy + timedelta(days=desplazamiento)
+
+        for intento in range(1, INTENTOS_RECONCILIACION + 1):
+            try:
+                reconciliar_resumenes(fecha)
+                click.echo(f'Resúmenes reconciliados para {fecha.isoformat()}')
+                break
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                click.echo(f'Error al reconciliar {fecha.isoformat()} (intento {intento}): {e}', err=True)
+        else:
+            fallidos.append(fecha.isoformat())
+
+    if fallidos:
+        raise click.ClickException(f'No se pudieron reconciliar los días: {", ".join(fallidos)}')
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Los módulos de la aplicación se importan sin paquete (from entities import *)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+# Las pruebas usan una base de datos SQLite en memoria en lugar de MySQL
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
@@ -0,0 +1,204 @@
+"""
+Pruebas de las tablas de resumen diario: se agendan citas por la ruta de la aplicación
+y se verifica que los resúmenes incrementales coinciden con los de la reconciliación.
+"""
+
+from datetime import date, time, timedelta
+from decimal import Decimal
+import pytest
+
+import db as rutas
+from entities import *
+from rollups import _aplicar_cambios, obtener_resumen_dashboard, reconciliar_resumenes
+
+
+@pytest.fixture
+def cliente():
+    app.config['TESTING'] = True
+    app.config['SESSION_COOKIE_SECURE'] = False  # El cliente de pruebas no usa HTTPS
+
+    with app.app_context():
+        db.create_all()
+
+        db.session.add_all([
+            Sucursal(id_sucursal=1, nombre='Centro', direccion='Sin especificar', telefono='0'),
+            Sucursal(id_sucursal=2, nombre='Norte', direccion='Sin especificar', telefono='0'),
+            Empleado(id_empleado=1, nombre='Ana', apellido='López', fecha_contratacion=date.today(), salario=0, calle='Sin especificar', codigo_postal='0', nombre_colonia='Sin especificar', id_sucursal=1, id_tipo_colonia=1, id_municipio=1),
+            Empleado(id_empleado=2, nombre='Luis', apellido='Pérez', fecha_contratacion=date.today(), salario=0, calle='Sin especificar', codigo_postal='0', nombre_colonia='Sin especificar', id_sucursal=2, id_tipo_colonia=1, id_municipio=1),
+            Doctor(id_doctor=1, cedula_profesional='A1', id_empleado=1),
+            Doctor(id_doctor=2, cedula_profesional='B2', id_empleado=2),
+            Paciente(id_paciente=1, nombre='Juan', apellido='Ruiz', edad=30, calle='Sin especificar', numero_exterior='0', codigo_postal='0', nombre_colonia='Sin especificar', numero_telefono='0'),
+            CitasDisponibles(id_cita_disponibles=1, fecha_disponible=date.today(), hora_disponible=time(9), id_doctor=1, id_sucursal=1),
+            CitasDisponibles(id_cita_disponibles=2, fecha_disponible=date.today(), hora_disponible=time(10), id_doctor=1, id_sucursal=1),
+            CitasDisponibles(id_cita_disponibles=3, fecha_disponible=date.today(), hora_disponible=time(11), id_doctor=1, id_sucursal=1),
+            CitasDisponibles(id_cita_disponibles=4, fecha_disponible=date.today(), hora_disponible=time(9), id_doctor=2, id_sucursal=2),
+        ])
+        db.session.commit()
+
+        cliente = app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['id_usuario'] = 1
+            sesion['nombre_usuario'] = 'juan'
+            sesion['token'] = 'token'
+
+        yield cliente
+
+        db.session.remove()
+        db.drop_all()
+
+
+def agendar(cliente, id_cita):
+    return cliente.post('/farmacia-alejo/citas', data={'agendar_cita': '1', 'cita_id': str(id_cita)})
+
+
+def resumenes(fecha):
+    sucursales = {
+        fila.id_sucursal: (fila.citas_agendadas, fila.espacios_disponibles, fila.numero_ventas, fila.total_ventas)
+        for fila in ResumenDiarioSucursal.query.filter_by(fecha=fecha)
+    }
+    doctores = {fila.id_doctor: fila.citas_agendadas for fila in ResumenDiarioDoctor.query.filter_by(fecha=fecha)}
+    return sucursales, doctores
+
+
+def test_agendar_crea_y_actualiza_resumenes(cliente):
+    hoy = date.today()
+
+    agendar(cliente, 1)
+    sucursales, doctores = resumenes(hoy)
+
+    # La primera reserva crea la fila desde las tablas origen
+    assert sucursales == {1: (1, 2, 0, 0)}
+    assert doctores == {1: 1}
+
+    agendar(cliente, 2)
+    sucursales, doctores = resumenes(hoy)
+
+    # La segunda reserva suma sobre la fila existente y descuenta el espacio
+    assert sucursales == {1: (2, 1, 0, 0)}
+    assert doctores == {1: 2}
+    assert CitasDisponibles.query.filter_by(id_cita_disponibles=2).first().disponible is False
+    assert Cita.query.filter_by(id_cita_disponible=2).count() == 1
+
+
+def test_resumenes_incrementales_igualan_reconciliacion(cliente):
+    hoy = date.today()
+
+    for id_cita in (1, 2, 4):
+        agendar(cliente, id_cita)
+
+    incrementales = resumenes(hoy)
+    reconciliar_resumenes(hoy)
+
+    assert resumenes(hoy) == incrementales
+
+
+def test_upsert_suma_sobre_fila_existente_sin_recalcular(cliente):
+    hoy = date.today()
+    claves = {'fecha': hoy, 'id_doctor': 1}
+    db.session.add(ResumenDiarioDoctor(citas_agendadas=5, **claves))
+    db.session.commit()
+
+    def no_debe_llamarse():
+        raise AssertionError('La fila ya existe, no se debe recalcular desde origen')
+
+    _aplicar_cambios(ResumenDiarioDoctor, claves, {'citas_agendadas': 1}, no_debe_llamarse)
+    db.session.commit()
+
+    assert resumenes(hoy)[1] == {1: 6}
+
+
+def test_upsert_suma_si_la_fila_aparece_al_insertar(cliente):
+    hoy = date.today()
+    claves = {'fecha': hoy, 'id_doctor': 1}
+
+    def fila_aparece_antes_del_insert():
+        # No simula concurrencia real (es la misma sesión): solo comprueba que el upsert
+        # resuelve el conflicto de llave sumando el cambio en lugar de fallar
+        db.session.execute(db.insert(ResumenDiarioDoctor).values(citas_agendadas=5, **claves))
+        return {'citas_agendadas': 1}
+
+    _aplicar_cambios(ResumenDiarioDoctor, claves, {'citas_agendadas': 1}, fila_aparece_antes_del_insert)
+    db.session.commit()
+
+    assert resumenes(hoy)[1] == {1: 6}
+
+
+def agregar_ventas(hoy):
+    db.session.add_all([
+        FormasDePago(id_pago=1, tipo_pago='Efectivo', fecha_pago=hoy),
+        Empleado(id_empleado=3, nombre='Eva', apellido='Soto', fecha_contratacion=hoy, salario=0, calle='Sin especificar', codigo_postal='0', nombre_colonia='Sin especificar', id_sucursal=None, id_tipo_colonia=1, id_municipio=1),
+        Venta(fecha_venta=hoy, total_venta=Decimal('100.50'), id_paciente=1, id_empleado=1, id_pago=1),
+        Venta(fecha_venta=hoy, total_venta=Decimal('20.00'), id_paciente=1, id_empleado=1, id_pago=1),
+        Venta(fecha_venta=hoy, total_venta=Decimal('30.25'), id_paciente=1, id_empleado=2, id_pago=1),
+        # Empleado sin sucursal y venta sin fecha: no se contabilizan
+        Venta(fecha_venta=hoy, total_venta=Decimal('50.00'), id_paciente=1, id_empleado=3, id_pago=1),
+        Venta(fecha_venta=None, total_venta=Decimal('999.00'), id_paciente=1, id_empleado=1, id_pago=1),
+    ])
+    db.session.commit()
+
+
+def test_reconciliacion_agrupa_ventas_por_sucursal(cliente):
+    hoy = date.today()
+    agregar_ventas(hoy)
+
+    reconciliar_resumenes(hoy)
+    sucursales, doctores = resumenes(hoy)
+
+    assert sucursales == {1: (0, 3, 2, Decimal('120.50')), 2: (0, 1, 1, Decimal('30.25'))}
+    assert doctores == {}
+
+    resumen = obtener_resumen_dashboard(hoy)
+    assert resumen['numero_ventas'] == 3
+    assert resumen['total_ventas'] == Decimal('150.75')
+    assert resumen['espacios_disponibles'] == 4
+
+
+def entrar_a_la_pagina_principal(cliente, tipo_usuario):
+    with cliente.session_transaction() as sesion:
+        sesion['tipo_usuario'] = tipo_usuario
+        sesion['token_final'] = rutas.serializer.dumps('token', salt='token-salt')
+
+    return cliente.get('/farmacia-alejo/home?usuario=juan')
+
+
+def test_tablero_solo_para_empleados(cliente):
+    hoy = date.today()
+    agregar_ventas(hoy)
+    agendar(cliente, 1)
+    reconciliar_resumenes(hoy)
+
+    respuesta = entrar_a_la_pagina_principal(cliente, 'Empleado')
+    html = respuesta.get_data(as_text=True)
+
+    assert respuesta.status_code == 200
+    assert 'Resumen del día' in html
+    assert '$150.75' in html
+    assert '$120.50' in html
+    assert 'Centro' in html and 'Norte' in html
+
+    respuesta = entrar_a_la_pagina_principal(cliente, 'Usuario')
+
+    assert respuesta.status_code == 200
+    assert 'Resumen del día' not in respuesta.get_data(as_text=True)
+
+
+def test_comando_reconciliar_resumenes(cliente):
+    hoy = date.today()
+    agregar_ventas(hoy)
+    db.session.add(ResumenDiarioSucursal(fecha=hoy, id_sucursal=1, citas_agendadas=9, espacios_disponibles=9, numero_ventas=9, total_ventas=9))
+    db.session.commit()
+
+    resultado = app.test_cli_runner().invoke(args=['reconciliar-resumenes', '--dias', '1', '--dias-futuros', '1'])
+
+    assert resultado.exit_code == 0
+    assert f'Resúmenes reconciliados para {hoy.isoformat()}' in resultado.output
+    assert f'Resúmenes reconciliados para {(hoy + timedelta(days=1)).isoformat()}' in resultado.output
+    db.session.expire_all()
+    assert resumenes(hoy)[0][1] == (0, 3, 2, Decimal('120.50'))
+
+
+def test_comando_reconciliar_resumenes_rechaza_dias_menores_a_uno(cliente):
+    resultado = app.test_cli_runner().invoke(args=['reconciliar-resumenes', '--dias', '0'])
+
+    assert resultado.exit_code != 0
+    assert 'Resúmenes reconciliados' not in resultado.output